@@ -8,19 +8,236 @@ making it useful for debugging, system inspection, and automation tasks. However
 unrestricted nature, it should only be used in controlled environments.
 
 Modules:
-    subprocess: Used to execute shell commands securely with output and error capturing.
+    asyncio: Used to execute shell commands without blocking the event loop, capturing
+        output and errors.
+    shlex: Splits plain commands so they can skip the shell entirely.
+    hashlib, threading, time, collections: Back the short-lived result cache.
+    os, signal: Read the subprocess concurrency limit and kill timed-out process groups.
     fastmcp: Provides the FastMCP framework for building MCP-compatible servers.
 """
 
-import subprocess
+import asyncio
+import os
+import shlex
+import signal
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Literal, Optional, Tuple
 from fastmcp import FastMCP, tools
 
 # Initialize FastMCP application instance
 app = FastMCP("Linux MCP Server (Unrestricted)")
 
+# Short-lived LRU cache of command output keyed by the command string. Caching is
+# opt-in (cache_hint="cache"), since arbitrary shell commands may have side effects.
+_CACHE_TTL = 5.0      # Seconds a cached result stays fresh
+_CACHE_MAX = 256      # Maximum number of cached results
+_CACHE_MAX_CHARS = 8 * 1024 * 1024    # Maximum total length of cached outputs
+_CACHE_MAX_ENTRY_CHARS = 256 * 1024   # Larger (e.g. truncated) outputs are not cached
+_RESULT_CACHE: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+_cache_chars = 0      # Total length of cached outputs
+
+# Output caps: only the head and tail of very large outputs (journalctl, find /)
+# are kept, bounding server memory and the size of the result sent to the client.
+_OUTPUT_HEAD_CAP = 256 * 1024   # Bytes kept from the start of each stream
+_OUTPUT_TAIL_CAP = 64 * 1024    # Bytes kept from the end of each stream
+_TRAILING_WS = b" \t\n\r\x0b\x0c"  # Stripped from the end of each stream
+
+
+def _max_concurrency() -> int:
+    """Return MCP_MAX_CONCURRENCY clamped to >= 1, or 2 x CPU count if unset/invalid."""
+    default = (os.cpu_count() or 1) * 2
+    try:
+        return max(1, int(os.environ.get("MCP_MAX_CONCURRENCY", default)))
+    except ValueError:
+        return default
+
+
+# Caps concurrently running subprocesses so bursts of tool calls cannot exhaust
+# PIDs or file descriptors. Cached results never wait on it. A slot is only
+# released once the command has exited or its process group has been killed.
+_PROC_SEM = asyncio.Semaphore(_max_concurrency())
+
+# Characters that need /bin/sh to interpret (operators, expansions, globs,
+# grouping, comments). Commands free of them are exec'd directly.
+_SHELL_CHARS = frozenset(";|&<>$`\\\n*?[]~#(){}!")
+
+# /bin/sh builtins. Several (echo, printf, test, kill, pwd) also exist as binaries
+# that behave differently, e.g. sh's echo prints "-e hi" for `echo -e hi`, so
+# these always go through the shell to keep its output.
+_SHELL_BUILTINS = frozenset({
+    "echo", "printf", "test", "kill", "pwd", "true", "false", "type", "command",
+    "cd", "umask", "ulimit", "read", "getopts", "hash", "alias", "unalias",
+    "wait", "jobs", "fg", "bg", "times", "trap", "exit", "export", "readonly",
+    "set", "unset", "shift", "eval", "exec", "return", "break", "continue",
+    "local", ".",
+})
+
+
+def _cache_key(command: str) -> str:
+    """Return a hex digest identifying the command string."""
+    return hashlib.blake2b(repr(command).encode(), digest_size=16).hexdigest()
+
+
+def _cache_evict(now: float) -> None:
+    """Drop expired, then least recently used, entries until within bounds (lock held)."""
+    global _cache_chars
+    # Entries are kept in insertion/use order, so stale ones mostly sit at the front
+    while _RESULT_CACHE:
+        oldest_key, (stored_at, output) = next(iter(_RESULT_CACHE.items()))
+        if (now - stored_at <= _CACHE_TTL
+                and len(_RESULT_CACHE) <= _CACHE_MAX
+                and _cache_chars <= _CACHE_MAX_CHARS):
+            break
+        del _RESULT_CACHE[oldest_key]
+        _cache_chars -= len(output)
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """Return a fresh cached result for key, evicting expired entries, or None."""
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        _cache_evict(now)
+
+        entry = _RESULT_CACHE.get(key)
+        if entry is not None and now - entry[0] <= _CACHE_TTL:
+            _RESULT_CACHE.move_to_end(key)
+            _CACHE_STATS["hits"] += 1
+            return entry[1]
+
+        _CACHE_STATS["misses"] += 1
+        return None
+
+
+def _cache_put(key: str, output: str) -> None:
+    """Store a result, evicting expired and least recently used entries to stay in bounds."""
+    global _cache_chars
+    if len(output) > _CACHE_MAX_ENTRY_CHARS:
+        return
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        old = _RESULT_CACHE.pop(key, None)
+        if old is not None:
+            _cache_chars -= len(old[1])
+        _RESULT_CACHE[key] = (now, output)
+        _cache_chars += len(output)
+        _cache_evict(now)
+
+
+async def _read_capped(stream: asyncio.StreamReader) -> bytes:
+    """Drain a pipe, keeping only the head and tail of outputs larger than the caps."""
+    head = bytearray()
+    tail = bytearray()
+    dropped = 0
+    while chunk := await stream.read(65536):
+        if len(head) < _OUTPUT_HEAD_CAP:
+            room = _OUTPUT_HEAD_CAP - len(head)
+            head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            tail += chunk
+            if len(tail) > _OUTPUT_TAIL_CAP:
+                excess = len(tail) - _OUTPUT_TAIL_CAP
+                del tail[:excess]
+                dropped += excess
+
+    if dropped:
+        head += f"\n...[TRUNCATED {dropped} bytes]...\n".encode()
+    return bytes(head + tail)
+
+
+def _decode_output(data: bytes) -> str:
+    """Decode process output without trailing whitespace, avoiding a full-size copy."""
+    end = len(data)
+    while end and data[end - 1] in _TRAILING_WS:
+        end -= 1
+    return str(memoryview(data)[:end], "utf-8", "replace")
+
+
+async def _spawn(command: str) -> asyncio.subprocess.Process:
+    """Start command directly when it needs no shell features or builtins, else via /bin/sh."""
+    if _SHELL_CHARS.isdisjoint(command):
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            argv = []                     # Unbalanced quotes: let the shell report it
+        if argv and argv[0] not in _SHELL_BUILTINS:
+            try:
+                return await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True,
+                )
+            except OSError:
+                pass                      # Assignments (FOO=1 cmd), missing binaries
+
+    return await asyncio.create_subprocess_shell(
+        command,                          # Runs via the shell: pipes, redirects, etc.
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,           # Own process group, so _kill_group reaches pipelines
+    )
+
+
+async def _kill_group(proc: asyncio.subprocess.Process) -> None:
+    """Kill a child and everything it started (e.g. a shell pipeline), then reap the child."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass                              # The whole group has already exited
+    await proc.wait()
+
+
+async def _run_shell(command: str, timeout: int, cache_hint: Optional[str]) -> Tuple[bool, str]:
+    """Run one shell command, returning (True, output) or (False, error message)."""
+    use_cache = cache_hint == "cache"
+    if use_cache:
+        key = _cache_key(command)
+        cached = _cache_get(key)
+        if cached is not None:
+            return True, cached
+
+    try:
+        async with _PROC_SEM:
+            proc = await _spawn(command)
+            try:
+                stdout, stderr, _ = await asyncio.wait_for(
+                    asyncio.gather(_read_capped(proc.stdout), _read_capped(proc.stderr), proc.wait()),
+                    timeout=timeout,
+                )
+            except BaseException:
+                # Timeout or cancellation (client disconnect): free the slot only
+                # once the command and anything it started are dead
+                await _kill_group(proc)
+                raise
+
+        parts = []
+        if stdout:
+            parts.append(f"STDOUT:\n{_decode_output(stdout)}")
+        if stderr:
+            parts.append(f"STDERR:\n{_decode_output(stderr)}")
+        parts.append(f"RETURN CODE: {proc.returncode}")
+
+        output = "\n\n".join(parts)
+        if use_cache:
+            _cache_put(key, output)
+        return True, output
+
+    except asyncio.TimeoutError:
+        return False, f"ERROR: Command timed out after {timeout} seconds."
+    except Exception as e:
+        return False, f"ERROR: {e}"
+
 
 @app.tool()
-def run_command(command: str, timeout: int = 15) -> str:
+async def run_command(
+    command: str, timeout: int = 15, cache_hint: Optional[Literal["cache", "no-cache"]] = None
+) -> str:
     """
     Execute a Linux shell command without a whitelist restriction.
 
@@ -38,6 +255,10 @@ def run_command(command: str, timeout: int = 15) -> str:
         timeout (int, optional): 
             Maximum execution time for the command in seconds. 
             Defaults to 15 seconds.
+        cache_hint (str, optional):
+            Pass "cache" to allow a result up to 5 seconds old to be reused
+            for a repeated, deterministic command (e.g. "uname -a"). By
+            default, or with "no-cache", the command always runs.
 
     Returns:
         str: 
@@ -60,37 +281,65 @@ def run_command(command: str, timeout: int = 15) -> str:
 
     Raises:
         Exception: If an unexpected error occurs during execution.
-        subprocess.TimeoutExpired: If the command exceeds the specified timeout.
 
     Notes:
-        - Since shell=True is enabled, this function supports advanced shell 
-          features (pipes, redirects, etc.).
+        - Commands using shell syntax run through /bin/sh, so advanced shell
+          features (pipes, redirects, globs, etc.) are supported. Plain
+          commands that are not shell builtins are executed directly, saving
+          the extra shell process.
+        - The subprocess is awaited, so a slow command does not block other
+          concurrent tool calls. On timeout the process is killed.
+        - Very large outputs keep only the first 256 KB and last 64 KB of each
+          stream, with a "[TRUNCATED N bytes]" marker in between.
         - For security reasons, do not expose this tool to untrusted users or 
           production environments without additional safeguards.
     """
-    try:
-        result = subprocess.run(
-            command,
-            shell=True,                   # Allows pipes, redirects, and shell features
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=timeout
-        )
-
-        output = ""
-        if result.stdout:
-            output += f"STDOUT:\n{result.stdout}\n"
-        if result.stderr:
-            output += f"STDERR:\n{result.stderr}\n"
-        output += f"RETURN CODE: {result.returncode}"
-
-        return output.strip()
-
-    except subprocess.TimeoutExpired:
-        return f"ERROR: Command timed out after {timeout} seconds."
-    except Exception as e:
-        return f"ERROR: {e}"
+    _, output = await _run_shell(command, timeout, cache_hint)
+    return output
+
+
+@app.tool()
+async def run_commands(
+    commands: List[str], timeout: int = 15, cache_hint: Optional[Literal["cache", "no-cache"]] = None
+) -> List[Dict[str, str]]:
+    """
+    Execute several Linux shell commands concurrently in one call.
+
+    Saves a round-trip per command when gathering a bundle of diagnostics
+    (e.g. "uname -a", "uptime", "free -m", "df -h"). A failing command does
+    not abort the batch; its slot holds an error instead.
+
+    Args:
+        commands (List[str]):
+            The shell commands to execute.
+        timeout (int, optional):
+            Maximum execution time for each command in seconds.
+            Defaults to 15 seconds.
+        cache_hint (str, optional):
+            Applied to every command, as in run_command.
+
+    Returns:
+        list: One dict per command, in input order, with the "command" and
+        either its "output" (formatted as in run_command) or an "error".
+    """
+    results = await asyncio.gather(*(_run_shell(c, timeout, cache_hint) for c in commands))
+    return [
+        {"command": c, "output" if ok else "error": text}
+        for c, (ok, text) in zip(commands, results)
+    ]
+
+
+@app.tool()
+def get_cache_stats() -> Dict[str, int]:
+    """
+    Report result-cache counters for run_command.
+
+    Returns:
+        dict: Cache hits, misses, the current number of cached entries, and
+        their total length in characters.
+    """
+    with _CACHE_LOCK:
+        return {**_CACHE_STATS, "size": len(_RESULT_CACHE), "chars": _cache_chars}
 
 
 if __name__ == "__main__":
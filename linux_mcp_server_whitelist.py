@@ -9,18 +9,33 @@ providing a safer way to expose limited system command functionality.
 Modules:
     shlex       -- Safely split command strings into argument lists
     shutil      -- Locate system executables in PATH
-    subprocess  -- Execute external commands with controlled input/output
+    signal      -- Re-resolve whitelisted executables on SIGHUP
+    os          -- Read the subprocess concurrency limit, kill process groups
+    functools   -- Memoize command tokenization
+    asyncio     -- Run external commands without blocking the event loop
     re          -- Regular expressions for argument validation
+    hashlib     -- Hash resolved argv into result-cache keys
+    threading   -- Guard the shared result cache
+    time        -- Monotonic timestamps for cache expiry
+    collections -- OrderedDict backing the LRU result cache
     typing      -- Type hints for cleaner function definitions
     fastmcp     -- Framework for MCP-compatible servers
 """
 
 import shlex
 import shutil
-import subprocess
+import signal
+import os
+import functools
+import asyncio
 import re
-from typing import List
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
 from fastmcp import FastMCP
+from fastmcp.tools.tool import ToolResult
 
 # Initialize FastMCP application instance
 app = FastMCP("Linux MCP Server (whitelist)")
@@ -28,20 +43,86 @@ app = FastMCP("Linux MCP Server (whitelist)")
 # --- Whitelist of allowed commands (base command names only) ---
 # Add or remove commands here as needed.
 # Avoid dangerous commands like rm, mv, shutdown, dd, etc.
-ALLOWED_COMMANDS = {
+ALLOWED_COMMANDS = frozenset({
     "ls", "cat", "head", "tail", "less", "grep", "egrep", "fgrep", "wc",
     "df", "du", "ps", "top", "uname", "whoami", "id", "uptime", "free",
     "ip", "ifconfig", "ss", "netstat", "journalctl", "systemctl",
     "mount", "umount", "stat", "find", "sed", "awk", "cut", "sort",
     "uniq", "tr", "env", "date", "hostname", "readlink", "file",
     "which", "bash",
-}
+})
 
 # --- Validation rules ---
-SHELL_META_PATTERN = re.compile(r"[;&|<>$`\\]")  # Disallowed metacharacters
+SHELL_META_BYTES = b";&|<>$`\\"                  # Disallowed metacharacters
+# Every byte except the metacharacters; translate() deletes these, so any byte left is unsafe
+_SAFE_BYTES = bytes(sorted(set(range(256)) - set(SHELL_META_BYTES)))
+_SHELL_META = frozenset(SHELL_META_BYTES.decode())
+_SHORT_TEXT = 32                                 # Up to this length a set test beats translate()
+# find -exec/-execdir/-ok/-okdir or --exec style options, as whole tokens only,
+# so that e.g. --executable=foo stays allowed
+_EXEC_PATTERN = re.compile(r"(?:^|\s)--?(?:exec|execdir|ok|okdir)(?:=|\s|$)")
+_QUOTES = frozenset("'\"")                       # Removed by shlex, so may hide unsafe patterns
 MAX_ARGS = 30                                    # Limit number of args
+MAX_ARG_LENGTH = 1024                            # Limit length of each arg
+MAX_COMMAND_LENGTH = 32768                       # Limit length of the whole command string
+# Fixed validation messages, built once rather than formatted on every rejection
+_ERR_NO_COMMAND = "No command provided."
+_ERR_TOO_LONG = f"Command too long (limit {MAX_COMMAND_LENGTH} characters)."
+_ERR_TOO_MANY_ARGS = f"Too many arguments (limit {MAX_ARGS})."
+# Quotes, backslashes and whitespace that str.split() treats differently from shlex
+_SPLIT_SLOW_CHARS = frozenset("\"'\\\x0b\x0c\x1c\x1d\x1e\x1f")
 DEFAULT_TIMEOUT = 10                             # Default command timeout (seconds)
 
+# --- Result cache ---
+# Short-lived LRU cache of command output keyed by the resolved argv, so that
+# repeated deterministic calls (uname -a, hostname) skip the subprocess. Only
+# runs of commands in _CACHEABLE that exit with status 0 are cached; anything
+# else always runs.
+_CACHE_TTL = 5.0                                 # Seconds a cached result stays fresh
+_CACHE_MAX = 256                                 # Maximum number of cached results
+_CACHE_MAX_CHARS = 8 * 1024 * 1024               # Maximum total length of cached outputs
+_CACHE_MAX_ENTRY_CHARS = 256 * 1024              # Larger (e.g. truncated) outputs are not cached
+_RESULT_CACHE: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+_cache_chars = 0                                 # Total length of cached outputs
+
+# Commands whose output only changes on reconfiguration. This one classification
+# drives both the server-side result cache and the _meta.cache_hint sent to
+# clients; everything else (date, uptime, ps, ...), and any run with a non-zero
+# return code, is "no-cache" on both sides.
+_CACHEABLE = frozenset({"uname", "hostname", "id", "whoami", "which", "readlink", "file"})
+_CLIENT_CACHE_TTL = 3600                         # Seconds clients may reuse a cacheable result
+_META_CACHE = {"cache_hint": "cache", "ttl": _CLIENT_CACHE_TTL}
+_META_NO_CACHE = {"cache_hint": "no-cache"}
+
+# Output caps: only the head and tail of very large outputs (journalctl, find /)
+# are kept, bounding server memory and the size of the result sent to the client.
+_OUTPUT_HEAD_CAP = 256 * 1024                    # Bytes kept from the start of each stream
+_OUTPUT_TAIL_CAP = 64 * 1024                     # Bytes kept from the end of each stream
+_TRAILING_WS = b" \t\n\r\x0b\x0c"                 # Stripped from the end of each stream
+
+
+def _max_concurrency() -> int:
+    """
+    Read the subprocess concurrency limit from MCP_MAX_CONCURRENCY.
+
+    Returns:
+        int: The configured limit clamped to at least 1, or 2 x CPU count when
+        the variable is unset or not an integer.
+    """
+    default = (os.cpu_count() or 1) * 2
+    try:
+        return max(1, int(os.environ.get("MCP_MAX_CONCURRENCY", default)))
+    except ValueError:
+        return default
+
+
+# Caps concurrently running subprocesses so bursts of tool calls cannot exhaust
+# PIDs or file descriptors. Cached results never wait on it. A slot is only
+# released once the command has exited or its process group has been killed.
+_PROC_SEM = asyncio.Semaphore(_max_concurrency())
+
 
 def is_allowed_base(cmd: str) -> bool:
     """
@@ -56,6 +137,30 @@ def is_allowed_base(cmd: str) -> bool:
     return cmd in ALLOWED_COMMANDS
 
 
+def _has_unsafe(text: str) -> bool:
+    """
+    Check text for shell metacharacters, -exec style options, or '..'.
+
+    Metacharacters are found with a frozenset membership test for short text
+    (typical arguments) and a single bytes.translate() pass for longer text
+    such as whole commands. The comparatively slow -exec regex only runs when
+    the text contains a '-'.
+
+    Args:
+        text (str): An argument or a whole command string.
+
+    Returns:
+        bool: True if any unsafe pattern is present.
+    """
+    if len(text) <= _SHORT_TEXT:
+        if not _SHELL_META.isdisjoint(text):
+            return True
+    # UTF-8 multi-byte sequences never contain ASCII bytes, so encoding is exact
+    elif text.encode("utf-8", "surrogatepass").translate(None, _SAFE_BYTES):
+        return True
+    return ".." in text or ("-" in text and _EXEC_PATTERN.search(text) is not None)
+
+
 def is_safe_arg(arg: str) -> bool:
     """
     Validate that a command argument is safe.
@@ -66,99 +171,414 @@ def is_safe_arg(arg: str) -> bool:
     Returns:
         bool: False if the argument contains unsafe patterns, True otherwise.
     """
-    if SHELL_META_PATTERN.search(arg):
-        return False
-    if re.search(r"\b-exec\b|\b--exec\b", arg):
-        return False
-    if ".." in arg:
-        return False
-    if len(arg) > 1024:
-        return False
-    return True
+    return len(arg) <= MAX_ARG_LENGTH and not _has_unsafe(arg)
 
 
-def split_command(command_text: str) -> List[str]:
+@functools.lru_cache(maxsize=512)
+def split_command(command_text: str) -> Tuple[str, ...]:
     """
-    Safely split a command string into a list of arguments.
+    Safely split a command string into a tuple of arguments.
+
+    Plain ASCII commands without quotes or backslashes are split with str.split(),
+    which gives the same tokens as shlex.split() without its pure-Python parser.
+    Results are memoized, as agents tend to repeat the same commands.
 
     Args:
         command_text (str): The command string.
 
     Returns:
-        List[str]: Tokenized command and arguments.
+        Tuple[str, ...]: Tokenized command and arguments.
+    """
+    if command_text.isascii() and _SPLIT_SLOW_CHARS.isdisjoint(command_text):
+        return tuple(command_text.split())
+    return tuple(shlex.split(command_text))
+
+
+def resolve_allowed_commands() -> Dict[str, str]:
+    """
+    Resolve every whitelisted command to its absolute path on PATH.
+
+    Commands missing from PATH are left out, so they are rejected at call time.
+
+    Returns:
+        Dict[str, str]: Mapping of base command name to executable path.
+    """
+    return {c: p for c in ALLOWED_COMMANDS if (p := shutil.which(c))}
+
+
+# Resolved once at import so no PATH scan happens per call; refreshed on SIGHUP
+_RESOLVED = resolve_allowed_commands()
+
+
+def _is_cacheable(argv: Sequence[str]) -> bool:
+    """
+    Check whether a command's output is deterministic enough to cache.
+
+    Args:
+        argv (Sequence[str]): Tokenized command; argv[0] may be a bare name or a path.
+
+    Returns:
+        bool: True if the base command is in _CACHEABLE.
     """
-    return shlex.split(command_text)
+    return argv[0].rpartition("/")[2] in _CACHEABLE
+
+
+def _cache_key(argv: List[str]) -> str:
+    """
+    Build a result-cache key from a resolved argument vector.
+
+    Args:
+        argv (List[str]): Final argv, including the resolved binary path.
+
+    Returns:
+        str: Hex digest identifying the argv.
+    """
+    return hashlib.blake2b(repr(argv).encode(), digest_size=16).hexdigest()
+
+
+def _cache_evict(now: float) -> None:
+    """
+    Drop expired entries, then least recently used ones until within bounds.
+
+    Must be called with _CACHE_LOCK held.
+
+    Args:
+        now (float): Current time.monotonic() value.
+    """
+    global _cache_chars
+    # Entries are kept in insertion/use order, so stale ones mostly sit at the front
+    while _RESULT_CACHE:
+        oldest_key, (stored_at, output) = next(iter(_RESULT_CACHE.items()))
+        if (now - stored_at <= _CACHE_TTL
+                and len(_RESULT_CACHE) <= _CACHE_MAX
+                and _cache_chars <= _CACHE_MAX_CHARS):
+            break
+        del _RESULT_CACHE[oldest_key]
+        _cache_chars -= len(output)
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """
+    Look up a fresh cached result, evicting expired entries.
+
+    Args:
+        key (str): Cache key from _cache_key().
+
+    Returns:
+        Optional[str]: The cached output, or None on a miss.
+    """
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        _cache_evict(now)
+
+        entry = _RESULT_CACHE.get(key)
+        if entry is not None and now - entry[0] <= _CACHE_TTL:
+            _RESULT_CACHE.move_to_end(key)
+            _CACHE_STATS["hits"] += 1
+            return entry[1]
+
+        _CACHE_STATS["misses"] += 1
+        return None
+
+
+def _cache_put(key: str, output: str) -> None:
+    """
+    Store a command result, evicting expired and least recently used entries.
+
+    Outputs longer than _CACHE_MAX_ENTRY_CHARS are not cached, and the total
+    cached length is kept under _CACHE_MAX_CHARS.
+
+    Args:
+        key (str): Cache key from _cache_key().
+        output (str): Formatted command output to cache.
+    """
+    global _cache_chars
+    if len(output) > _CACHE_MAX_ENTRY_CHARS:
+        return
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        old = _RESULT_CACHE.pop(key, None)
+        if old is not None:
+            _cache_chars -= len(old[1])
+        _RESULT_CACHE[key] = (now, output)
+        _cache_chars += len(output)
+        _cache_evict(now)
+
+
+async def _read_capped(stream: asyncio.StreamReader) -> bytes:
+    """
+    Drain a subprocess pipe, keeping only the head and tail of large outputs.
+
+    Args:
+        stream (asyncio.StreamReader): The process stdout or stderr pipe.
+
+    Returns:
+        bytes: The full output, or its first _OUTPUT_HEAD_CAP and last
+        _OUTPUT_TAIL_CAP bytes around a "[TRUNCATED N bytes]" marker.
+    """
+    head = bytearray()
+    tail = bytearray()
+    dropped = 0
+    while chunk := await stream.read(65536):
+        if len(head) < _OUTPUT_HEAD_CAP:
+            room = _OUTPUT_HEAD_CAP - len(head)
+            head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            tail += chunk
+            if len(tail) > _OUTPUT_TAIL_CAP:
+                excess = len(tail) - _OUTPUT_TAIL_CAP
+                del tail[:excess]
+                dropped += excess
+
+    if dropped:
+        head += f"\n...[TRUNCATED {dropped} bytes]...\n".encode()
+    return bytes(head + tail)
+
+
+def _decode_output(data: bytes) -> str:
+    """
+    Decode captured process output, dropping trailing whitespace.
+
+    Only the trailing bytes are inspected, and the buffer is decoded through a
+    memoryview, so large outputs are not copied again as rstrip() would.
+
+    Args:
+        data (bytes): Captured stdout or stderr.
+
+    Returns:
+        str: The decoded text without trailing whitespace.
+    """
+    end = len(data)
+    while end and data[end - 1] in _TRAILING_WS:
+        end -= 1
+    return str(memoryview(data)[:end], "utf-8", "replace")
+
+
+def build_argv(command: str) -> List[str]:
+    """
+    Validate a command string against the whitelist and resolve its binary.
+
+    Args:
+        command (str): Full command string, e.g., "ls -la /var/log".
+
+    Returns:
+        List[str]: Final argv with the base command replaced by its resolved path.
+
+    Raises:
+        ValueError: If the command is empty, not whitelisted, not found, or has unsafe arguments.
+    """
+    if len(command) > MAX_COMMAND_LENGTH:
+        raise ValueError(_ERR_TOO_LONG)
+
+    # A single scan of the raw string stands in for the per-argument checks.
+    # Quoted commands still get checked per argument, since shlex strips the
+    # quotes and can join e.g. '.'. or -ex''ec into an unsafe token.
+    check_args = _has_unsafe(command) or not _QUOTES.isdisjoint(command)
+
+    argv = split_command(command)
+    if not argv:
+        raise ValueError(_ERR_NO_COMMAND)
+
+    base_name = argv[0].rpartition("/")[2]
+
+    # Validate base command
+    if not is_allowed_base(base_name):
+        raise ValueError(f"Command '{base_name}' is not allowed by server whitelist.")
+
+    # Ensure the binary exists
+    resolved = _RESOLVED.get(base_name)
+    if resolved is None:
+        raise ValueError(f"Command '{base_name}' not found on server PATH.")
+
+    # Validate arguments
+    args = argv[1:]
+    if len(args) > MAX_ARGS:
+        raise ValueError(_ERR_TOO_MANY_ARGS)
+
+    if check_args or len(command) > MAX_ARG_LENGTH:
+        for a in args:
+            if not is_safe_arg(a):
+                raise ValueError(f"Unsafe argument detected: {a!s}")
+
+    # Final argv with resolved binary
+    return [resolved, *args]
+
+
+async def _kill_group(proc: asyncio.subprocess.Process) -> None:
+    """
+    Kill a child started with start_new_session=True, together with anything it
+    spawned (e.g. the children of a bash script), and reap it.
+
+    Args:
+        proc (asyncio.subprocess.Process): The child process to kill.
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass                                     # The whole group has already exited
+    await proc.wait()
+
+
+async def _execute(final_argv: List[str], timeout: int, cache_hint: Optional[str]) -> Tuple[str, int]:
+    """
+    Run a validated argv without a shell.
+
+    Commands in _CACHEABLE are served from, and stored in, the result cache.
+    Only runs that exit with status 0 are cached, so a cache hit implies 0.
+
+    Args:
+        final_argv (List[str]): Argv returned by build_argv().
+        timeout (int): Seconds before the command is terminated.
+        cache_hint (str, optional): "no-cache" to skip reading the result cache.
+
+    Returns:
+        Tuple[str, int]: Formatted STDOUT / STDERR / RETURN CODE block, and the return code.
+
+    Raises:
+        asyncio.TimeoutError: If the command exceeds the timeout (the process is killed).
+    """
+    cacheable = _is_cacheable(final_argv)
+    if cacheable:
+        key = _cache_key(final_argv)
+        if cache_hint != "no-cache":
+            cached = _cache_get(key)
+            if cached is not None:
+                return cached, 0
+
+    async with _PROC_SEM:
+        # Run safely without shell; awaiting keeps other tool calls served meanwhile.
+        # Don't pass preexec_fn, user/group or extra_groups: any of them makes
+        # CPython fall back from vfork() to fork(), whose page-table copy grows
+        # with the server's RSS. start_new_session does not.
+        proc = await asyncio.create_subprocess_exec(
+            *final_argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        try:
+            stdout, stderr, _ = await asyncio.wait_for(
+                asyncio.gather(_read_capped(proc.stdout), _read_capped(proc.stderr), proc.wait()),
+                timeout=timeout,
+            )
+        except BaseException:
+            # Timeout or cancellation (client disconnect): free the slot only
+            # once the command and anything it started are dead
+            await _kill_group(proc)
+            raise
+
+    out_lines = []
+    if stdout:
+        out_lines.append("STDOUT:\n" + _decode_output(stdout))
+    if stderr:
+        out_lines.append("STDERR:\n" + _decode_output(stderr))
+    out_lines.append(f"RETURN CODE: {proc.returncode}")
+
+    output = "\n\n".join(out_lines)
+    if cacheable and proc.returncode == 0:
+        _cache_put(key, output)
+    return output, proc.returncode
+
+
+async def _run_checked(command: str, timeout: int, cache_hint: Optional[str]) -> Tuple[Optional[int], str]:
+    """
+    Validate and run one command, converting any failure into an error message.
+
+    Args:
+        command (str): Full command string.
+        timeout (int): Seconds before the command is terminated.
+        cache_hint (str, optional): "no-cache" to bypass the result cache.
+
+    Returns:
+        Tuple[Optional[int], str]: (return code, output) if the command ran, or
+        (None, error message) if it was rejected, timed out or failed to start.
+    """
+    try:
+        output, returncode = await _execute(build_argv(command), timeout, cache_hint)
+        return returncode, output
+    except ValueError as e:
+        return None, f"ERROR: {e}"
+    except asyncio.TimeoutError:
+        return None, f"ERROR: Command timed out after {timeout} seconds."
+    except Exception as e:
+        return None, f"ERROR: Exception while running command: {e}"
 
 
 @app.tool
-def run_command(command: str, timeout: int = DEFAULT_TIMEOUT) -> str:
+async def run_command(
+    command: str, timeout: int = DEFAULT_TIMEOUT, cache_hint: Optional[Literal["cache", "no-cache"]] = None
+) -> ToolResult:
     """
     Run a whitelisted Linux command.
 
     Args:
         command (str): Full command string, e.g., "ls -la /var/log".
         timeout (int, optional): Seconds before the command is terminated. Defaults to DEFAULT_TIMEOUT.
+        cache_hint (str, optional): Pass "no-cache" to bypass the short-lived result cache
+            and always run the command. Only deterministic commands (uname, hostname,
+            id, ...) are ever cached.
 
     Returns:
-        str: Command execution result including:
+        ToolResult: Text content with the command execution result including:
              - STDOUT (if any)
              - STDERR (if any)
              - RETURN CODE
              - Whitelist validation feedback
+             Streams larger than the output caps are truncated in the middle.
+             _meta.cache_hint is "cache" (with a ttl) for runs of commands in
+             _CACHEABLE that exit with status 0, and "no-cache" otherwise.
     """
-    try:
-        argv = split_command(command)
-        if not argv:
-            return "ERROR: No command provided."
+    returncode, output = await _run_checked(command, timeout, cache_hint)
+    meta = _META_NO_CACHE
+    if returncode == 0 and _is_cacheable(split_command(command)):
+        meta = _META_CACHE
+    return ToolResult(content=output, structured_content={"result": output}, meta=dict(meta))
 
-        base = argv[0]
-        base_name = base.split("/")[-1]
 
-        # Validate base command
-        if not is_allowed_base(base_name):
-            return f"ERROR: Command '{base_name}' is not allowed by server whitelist."
+@app.tool
+async def run_commands(
+    commands: List[str], timeout: int = DEFAULT_TIMEOUT, cache_hint: Optional[Literal["cache", "no-cache"]] = None
+) -> List[Dict[str, str]]:
+    """
+    Run several whitelisted Linux commands concurrently in one call.
 
-        # Ensure the binary exists
-        resolved = shutil.which(base_name)
-        if resolved is None:
-            return f"ERROR: Command '{base_name}' not found on server PATH."
+    Each command goes through the same validation as run_command. A failing
+    command does not abort the batch; its slot holds an error instead.
 
-        # Validate arguments
-        args = argv[1:]
-        if len(args) > MAX_ARGS:
-            return f"ERROR: Too many arguments (limit {MAX_ARGS})."
+    Args:
+        commands (List[str]): Command strings, e.g., ["uname -a", "uptime", "df -h"].
+        timeout (int, optional): Per-command timeout in seconds. Defaults to DEFAULT_TIMEOUT.
+        cache_hint (str, optional): Applied to every command, as in run_command.
 
-        for a in args:
-            if not is_safe_arg(a):
-                return f"ERROR: Unsafe argument detected: {a!s}"
-
-        # Final argv with resolved binary
-        final_argv = [resolved] + args
-
-        # Run safely without shell
-        proc = subprocess.run(
-            final_argv,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=timeout,
-        )
+    Returns:
+        List[Dict[str, str]]: One entry per command, in input order, with the
+        "command" and either its "output" or an "error" message.
+    """
+    results = await asyncio.gather(*(_run_checked(c, timeout, cache_hint) for c in commands))
+    return [
+        {"command": c, "output" if returncode is not None else "error": text}
+        for c, (returncode, text) in zip(commands, results)
+    ]
 
-        out_lines = []
-        if proc.stdout:
-            out_lines.append("STDOUT:\n" + proc.stdout.rstrip())
-        if proc.stderr:
-            out_lines.append("STDERR:\n" + proc.stderr.rstrip())
-        out_lines.append(f"RETURN CODE: {proc.returncode}")
 
-        return "\n\n".join(out_lines)
+@app.tool
+def get_cache_stats() -> Dict[str, int]:
+    """
+    Report result-cache counters for run_command.
 
-    except subprocess.TimeoutExpired:
-        return f"ERROR: Command timed out after {timeout} seconds."
-    except Exception as e:
-        return f"ERROR: Exception while running command: {e}"
+    Returns:
+        Dict[str, int]: Cache hits, misses, the current number of cached entries,
+        and their total length in characters.
+    """
+    with _CACHE_LOCK:
+        return {**_CACHE_STATS, "size": len(_RESULT_CACHE), "chars": _cache_chars}
 
 
 if __name__ == "__main__":
+    # Pick up newly installed binaries without a restart: kill -HUP <pid>
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: _RESOLVED.update(resolve_allowed_commands()))
+
     # Start the MCP server
     app.run()